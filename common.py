@@ -0,0 +1,203 @@
+"""Shared plumbing for the Streamlit apps: HTTP clients, auth, caching."""
+
+import streamlit as st
+import requests
+import httpx
+import json
+import sqlite3
+from requests.adapters import HTTPAdapter
+from requests.packages.urllib3.util.retry import Retry
+import time
+import difflib
+
+# User agent to mimic a browser
+HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
+    # Only encodings urllib3 can decode without extra packages; adding br
+    # here would hand back raw brotli bytes unless brotli(cffi) is installed
+    'Accept-Encoding': 'gzip, deflate'
+}
+
+# Stop reading a fetched page beyond this many characters so one huge
+# article can't balloon memory (and the LLM prompt) unbounded
+MAX_CONTENT_CHARS = 2_000_000
+
+# Retry policy for the shared session, built once at import; Retry
+# instances are immutable (urllib3 copies them via new() on each attempt),
+# so one policy is safe to share everywhere
+RETRY_STRATEGY = Retry(
+    total=3,
+    status_forcelist=[429, 500, 502, 503, 504],
+    allowed_methods=["HEAD", "GET", "OPTIONS"],
+    backoff_factor=1,
+    backoff_max=10
+)
+
+@st.cache_resource
+def get_http():
+    """Singleton requests session with retries and a keepalive pool."""
+    adapter = HTTPAdapter(
+        max_retries=RETRY_STRATEGY,
+        pool_connections=20,
+        pool_maxsize=20
+    )
+    session = requests.Session()
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+http = get_http()
+
+# HTTP/2 client for OpenRouter so the analyze and recommend calls share
+# one keepalive connection instead of redoing the TLS handshake each time
+openrouter = httpx.Client(
+    http2=True,
+    timeout=60,
+    limits=httpx.Limits(max_keepalive_connections=20)
+)
+
+class SimilarityCache:
+    """Near-match cache for LLM responses.
+
+    Re-pasted audit data often differs only in whitespace or minor edits,
+    which the exact-hash st.cache_data key misses. Prompts are
+    whitespace-normalized and compared with difflib; a match at or above
+    the threshold reuses the cached response instead of re-billing Claude.
+
+    Entries are mirrored to a local SQLite file so responses survive app
+    restarts and redeploys; expired rows are pruned on startup.
+
+    Similarity runs over word tokens, not characters: quick_ratio over
+    words compares vocabulary frequencies, so prompts about different
+    pages are rejected cheaply, whereas over characters any two English
+    texts of similar length score ~0.99 and everything falls through to
+    the quadratic full diff. Token lists are also capped so one huge
+    page can't make a single comparison take seconds.
+    """
+
+    # Compare at most this many leading word tokens per prompt; bounds the
+    # cost of the full SequenceMatcher pass on very long page content
+    MAX_COMPARE_TOKENS = 5000
+
+    def __init__(self, path=".llm_cache.db", threshold=0.90, ttl=7 * 86400):
+        self.threshold = threshold
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS responses (prompt TEXT, response TEXT, created REAL)"
+        )
+        self._db.execute("DELETE FROM responses WHERE created < ?", (time.time() - ttl,))
+        self._db.commit()
+        # list of (word_tokens, response); similarity scans run in memory
+        self._entries = [
+            (self._tokenize(prompt), response)
+            for prompt, response in self._db.execute("SELECT prompt, response FROM responses")
+        ]
+
+    @staticmethod
+    def _normalize(prompt):
+        return " ".join(prompt.split())
+
+    @classmethod
+    def _tokenize(cls, prompt):
+        return prompt.split()[:cls.MAX_COMPARE_TOKENS]
+
+    def get(self, prompt):
+        target = self._tokenize(prompt)
+        for cached_tokens, response in self._entries:
+            matcher = difflib.SequenceMatcher(None, target, cached_tokens)
+            # real_quick_ratio filters on length, quick_ratio on word
+            # frequencies; only near-identical prompts reach the full diff
+            if matcher.real_quick_ratio() >= self.threshold \
+                    and matcher.quick_ratio() >= self.threshold \
+                    and matcher.ratio() >= self.threshold:
+                return response
+        return None
+
+    def set(self, prompt, response):
+        normalized = self._normalize(prompt)
+        self._db.execute(
+            "INSERT INTO responses VALUES (?, ?, ?)", (normalized, response, time.time())
+        )
+        self._db.commit()
+        self._entries.append((self._tokenize(normalized), response))
+
+@st.cache_resource
+def get_llm_cache():
+    return SimilarityCache(threshold=0.90)
+
+def check_password():
+    """Returns `True` if the user had the correct password."""
+    def password_entered():
+        if st.session_state["password"] == st.secrets["password"]:
+            st.session_state["password_correct"] = True
+            del st.session_state["password"]
+        else:
+            st.session_state["password_correct"] = False
+
+    if "password_correct" not in st.session_state:
+        st.text_input(
+            "Password", type="password", on_change=password_entered, key="password"
+        )
+        return False
+    elif not st.session_state["password_correct"]:
+        st.text_input(
+            "Password", type="password", on_change=password_entered, key="password"
+        )
+        st.error("😕 Password incorrect")
+        return False
+    else:
+        return True
+
+@st.cache_data(ttl=3600, persist="disk", show_spinner=False)
+def get_jina_reader_content(url):
+    """Fetch the Jina-rendered page for `url`.
+
+    Raises requests.exceptions.RequestException on failure so that
+    st.cache_data only ever caches successful fetches; callers format
+    the error for display.
+    """
+    jina_url = f"https://r.jina.ai/{url}"
+    with http.get(jina_url, headers=HEADERS, stream=True) as response:
+        response.raise_for_status()
+        chunks = []
+        total = 0
+        for chunk in response.iter_content(chunk_size=64 * 1024, decode_unicode=True):
+            total += len(chunk)
+            if total > MAX_CONTENT_CHARS:
+                break
+            chunks.append(chunk)
+        return "".join(chunks)
+
+def openrouter_stream(api_key, system, prompt):
+    """Stream completion tokens from OpenRouter as they are generated."""
+    with openrouter.stream(
+        "POST",
+        "https://openrouter.ai/api/v1/chat/completions",
+        headers={
+            "Authorization": f"Bearer {api_key}",
+            "Content-Type": "application/json"
+        },
+        json={
+            "model": "anthropic/claude-3.5-sonnet",
+            "messages": [
+                {"role": "system", "content": system},
+                {"role": "user", "content": prompt}
+            ],
+            "stream": True
+        }
+    ) as response:
+        if response.status_code != 200:
+            detail = response.read().decode('utf-8', 'replace')
+            raise RuntimeError(f"Error from OpenRouter API: {response.status_code} - {detail}")
+        for line in response.iter_lines():
+            if not line.startswith("data: "):
+                continue
+            payload = line[len("data: "):]
+            if payload == "[DONE]":
+                break
+            choices = json.loads(payload).get('choices')
+            if not choices:
+                continue
+            token = choices[0].get('delta', {}).get('content')
+            if token:
+                yield token
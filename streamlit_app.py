@@ -1,11 +1,10 @@
 import streamlit as st
 import requests
-import json
-from requests.adapters import HTTPAdapter
-from requests.packages.urllib3.util.retry import Retry
-import time
+import re
+import string
 import os
-import difflib
+
+from common import check_password, get_jina_reader_content, get_llm_cache, openrouter_stream
 
 # Initialize session state
 if 'content' not in st.session_state:
@@ -21,80 +20,31 @@ if 'seo_analysis' not in st.session_state:
 if 'recommendations' not in st.session_state:
     st.session_state.recommendations = ""
 
-# User agent to mimic a browser
-HEADERS = {
-    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-}
-
-# Create a retry strategy
-retry_strategy = Retry(
-    total=3,
-    status_forcelist=[429, 500, 502, 503, 504],
-    allowed_methods=["HEAD", "GET", "OPTIONS"],
-    backoff_factor=1
-)
-adapter = HTTPAdapter(max_retries=retry_strategy)
-http = requests.Session()
-http.mount("https://", adapter)
-http.mount("http://", adapter)
-
-def check_password():
-    """Returns `True` if the user had the correct password."""
-    def password_entered():
-        if st.session_state["password"] == st.secrets["password"]:
-            st.session_state["password_correct"] = True
-            del st.session_state["password"]
-        else:
-            st.session_state["password_correct"] = False
-
-    if "password_correct" not in st.session_state:
-        st.text_input(
-            "Password", type="password", on_change=password_entered, key="password"
-        )
-        return False
-    elif not st.session_state["password_correct"]:
-        st.text_input(
-            "Password", type="password", on_change=password_entered, key="password"
-        )
-        st.error("😕 Password incorrect")
-        return False
-    else:
-        return True
-
-def get_jina_reader_content(url):
-    jina_url = f"https://r.jina.ai/{url}"
-    try:
-        response = http.get(jina_url, headers=HEADERS)
-        response.raise_for_status()
-        time.sleep(3)  # 3-second delay between requests
-        return response.text
-    except requests.exceptions.RequestException as e:
-        return f"Failed to fetch content: {str(e)}"
-
-def analyze_seo_data(organic_kw_ranks, semrush_site_audit, technical_seo_audit):
-    OPENROUTER_API_KEY = os.getenv('OPENROUTER_API_KEY')
-    if not OPENROUTER_API_KEY:
-        st.error("OpenRouter API key not found. Please set the OPENROUTER_API_KEY environment variable.")
-        return None
-
-    prompt = f"""Analyze the following SEO data from organic keyword rankings, SEMrush site audit, and technical SEO audit. Provide a detailed analysis and prioritization of keywords and opportunities.
+# Prompt template built once at import; only the five variable fields are
+# substituted per call
+ANALYZE_AND_RECOMMEND_PROMPT = string.Template("""Analyze the following SEO data from organic keyword rankings, SEMrush site audit, and technical SEO audit. Provide a detailed analysis and prioritization of keywords and opportunities. Then, based on that analysis and the current page content, generate specific recommendations for optimizing the page at $url.
 
 Organic Keyword Rankings:
 <organic_kw_ranks>
-{organic_kw_ranks}
+$organic_kw_ranks
 </organic_kw_ranks>
 
 SEMrush Site Audit:
 <semrush_site_audit>
-{semrush_site_audit}
+$semrush_site_audit
 </semrush_site_audit>
 
 Technical SEO Audit:
 <technical_seo_audit>
-{technical_seo_audit}
+$technical_seo_audit
 </technical_seo_audit>
 
-Provide your analysis in the following format:
+Current page content:
+<current_content>
+$content
+</current_content>
+
+First, provide your analysis in the following format:
 
 <seo_analysis>
 1. Key Issues and Opportunities:
@@ -117,48 +67,8 @@ Provide your analysis in the following format:
    - Key technical issues identified
    - Prioritized list of technical improvements
 </seo_analysis>
-"""
-
-    response = requests.post(
-        url="https://openrouter.ai/api/v1/chat/completions",
-        headers={
-            "Authorization": f"Bearer {OPENROUTER_API_KEY}",
-            "Content-Type": "application/json"
-        },
-        json={
-            "model": "anthropic/claude-3.5-sonnet",
-            "messages": [
-                {"role": "system", "content": "You are a helpful assistant that analyzes SEO data and provides strategic insights."},
-                {"role": "user", "content": prompt}
-            ]
-        }
-    )
-    
-    if response.status_code == 200:
-        return response.json()['choices'][0]['message']['content']
-    else:
-        st.error(f"Error from OpenRouter API: {response.status_code} - {response.text}")
-        return None
-
-def generate_recommendations(url, content, seo_analysis):
-    OPENROUTER_API_KEY = os.getenv('OPENROUTER_API_KEY')
-    if not OPENROUTER_API_KEY:
-        st.error("OpenRouter API key not found. Please set the OPENROUTER_API_KEY environment variable.")
-        return None
-
-    prompt = f"""Based on the following SEO analysis and the current page content, generate specific recommendations for optimizing the page at {url}.
-
-SEO Analysis:
-<seo_analysis>
-{seo_analysis}
-</seo_analysis>
-
-Current page content:
-<current_content>
-{content}
-</current_content>
 
-Provide your recommendations in the following format:
+Then, provide your recommendations in the following format:
 
 <page_recommendations>
 1. Page Title:
@@ -190,28 +100,60 @@ Provide your recommendations in the following format:
 7. Technical Improvements:
    - List of technical SEO improvements specific to this page
 </page_recommendations>
-"""
-
-    response = requests.post(
-        url="https://openrouter.ai/api/v1/chat/completions",
-        headers={
-            "Authorization": f"Bearer {OPENROUTER_API_KEY}",
-            "Content-Type": "application/json"
-        },
-        json={
-            "model": "anthropic/claude-3.5-sonnet",
-            "messages": [
-                {"role": "system", "content": "You are a helpful assistant that provides specific SEO recommendations for web pages."},
-                {"role": "user", "content": prompt}
-            ]
-        }
+""")
+
+SYSTEM_PROMPT = "You are a helpful assistant that analyzes SEO data and provides specific SEO recommendations for web pages."
+
+RESPONSE_PATTERN = re.compile(
+    r'<seo_analysis>(.*?)</seo_analysis>.*?<page_recommendations>(.*?)</page_recommendations>',
+    re.S
+)
+
+def show_outputs():
+    """Render the fetched content and LLM outputs.
+
+    Uses st.code rather than st.text_area: these blocks are read-only,
+    and st.code skips the controlled-input round-tripping a text area
+    does for its editable value on every rerun.
+    """
+    if st.session_state.content:
+        st.subheader("Current Page Content:")
+        st.code(st.session_state.content, language=None)
+
+    if st.session_state.seo_analysis:
+        st.subheader("SEO Analysis:")
+        st.code(st.session_state.seo_analysis, language=None)
+
+    if st.session_state.recommendations:
+        st.subheader("Page Optimization Recommendations:")
+        st.code(st.session_state.recommendations, language=None)
+
+def analyze_and_recommend(api_key, url, content, organic_kw_ranks, semrush_site_audit, technical_seo_audit):
+    prompt = ANALYZE_AND_RECOMMEND_PROMPT.substitute(
+        url=url,
+        content=content,
+        organic_kw_ranks=organic_kw_ranks,
+        semrush_site_audit=semrush_site_audit,
+        technical_seo_audit=technical_seo_audit
     )
-    
-    if response.status_code == 200:
-        return response.json()['choices'][0]['message']['content']
-    else:
-        st.error(f"Error from OpenRouter API: {response.status_code} - {response.text}")
-        return None
+
+    llm_cache = get_llm_cache()
+    cached = llm_cache.get(prompt)
+    if cached is not None:
+        yield cached
+        return
+
+    parts = []
+    for token in openrouter_stream(api_key, SYSTEM_PROMPT, prompt):
+        parts.append(token)
+        yield token
+
+    # Only cache responses carrying both expected blocks; otherwise a
+    # truncated, empty, or format-drifted response would be served from
+    # the 7-day persistent cache on every retry of the same inputs
+    full_response = "".join(parts)
+    if RESPONSE_PATTERN.search(full_response):
+        llm_cache.set(prompt, full_response)
 
 def main():
     st.title('Advanced SEO Content Optimizer')
@@ -226,45 +168,54 @@ def main():
         
         if st.button('Analyze and Generate Recommendations'):
             if url and st.session_state.organic_kw_ranks and st.session_state.semrush_site_audit and st.session_state.technical_seo_audit:
-                with st.spinner('Fetching content...'):
-                    st.session_state.content = get_jina_reader_content(url)
-                
-                if st.session_state.content and not st.session_state.content.startswith("Failed to fetch content"):
+                api_key = os.getenv('OPENROUTER_API_KEY')
+                if not api_key:
+                    st.error("OpenRouter API key not found. Please set the OPENROUTER_API_KEY environment variable.")
+                    st.stop()
+
+                try:
+                    with st.spinner('Fetching content...'):
+                        st.session_state.content = get_jina_reader_content(url)
+                except requests.exceptions.RequestException as e:
+                    st.session_state.content = ""
+                    st.error(f"Failed to fetch content: {str(e)}")
+
+                if st.session_state.content:
                     st.success("Content fetched successfully!")
-                    
-                    with st.spinner('Analyzing SEO data...'):
-                        seo_analysis = analyze_seo_data(st.session_state.organic_kw_ranks, st.session_state.semrush_site_audit, st.session_state.technical_seo_audit)
-                    
-                    if seo_analysis:
-                        st.success("SEO data analyzed successfully!")
-                        st.session_state.seo_analysis = seo_analysis
-                        
-                        with st.spinner('Generating recommendations...'):
-                            recommendations = generate_recommendations(url, st.session_state.content, seo_analysis)
-                        
-                        if recommendations:
-                            st.success("Recommendations generated successfully!")
-                            st.session_state.recommendations = recommendations
+
+                    # Stream tokens into a placeholder as they arrive, then
+                    # clear it so the parsed sections below aren't duplicated
+                    stream_area = st.empty()
+                    try:
+                        with stream_area.container():
+                            response_text = st.write_stream(analyze_and_recommend(
+                                api_key,
+                                url,
+                                st.session_state.content,
+                                st.session_state.organic_kw_ranks,
+                                st.session_state.semrush_site_audit,
+                                st.session_state.technical_seo_audit
+                            ))
+                    except RuntimeError as e:
+                        st.error(str(e))
+                        response_text = None
+                    else:
+                        stream_area.empty()
+
+                    if response_text:
+                        match = RESPONSE_PATTERN.search(response_text)
+                        if match:
+                            st.success("Analysis and recommendations generated successfully!")
+                            st.session_state.seo_analysis = match.group(1).strip()
+                            st.session_state.recommendations = match.group(2).strip()
                         else:
-                            st.error("Failed to generate recommendations.")
+                            st.error("Could not parse the analysis and recommendations from the model response.")
                     else:
-                        st.error("Failed to analyze SEO data.")
-                else:
-                    st.error(st.session_state.content)
+                        st.error("Failed to analyze SEO data and generate recommendations.")
             else:
                 st.warning('Please enter a URL and paste all required data')
         
-        if st.session_state.content:
-            st.subheader("Current Page Content:")
-            st.text_area("Full content", st.session_state.content, height=200)
-        
-        if 'seo_analysis' in st.session_state and st.session_state.seo_analysis:
-            st.subheader("SEO Analysis:")
-            st.text_area("Analysis and insights", st.session_state.seo_analysis, height=300)
-        
-        if 'recommendations' in st.session_state and st.session_state.recommendations:
-            st.subheader("Page Optimization Recommendations:")
-            st.text_area("Specific recommendations", st.session_state.recommendations, height=400)
+        show_outputs()
 
 if __name__ == "__main__":
     main()